@@ -136,6 +136,18 @@ def fetch_finazon_safe(ticker, finazon_key, start_ts=None, end_ts=None):
 # ==========================================
 # 📊 METRICS & CSV
 # ==========================================
+# Canonical Rename Map (User Hard Spec) — built once at import, not per upload
+CSV_RENAME_MAP = {
+    'SHARE': 'Shares', 'Share': 'Shares', 
+    'AVG COST': 'AvgCost', 'Avg Cost': 'AvgCost', 
+    'MARKET PRICE': 'MarketPrice', 'Market Price': 'MarketPrice',
+    'Value': 'MarketValue', 'Market Value': 'MarketValue',
+    'TOTAL COST': 'TotalCost', 'Total Cost': 'TotalCost',
+    'PROFIT': 'PnL', 'Profit': 'PnL',
+    'PROFIT%': 'PnLPct', 'Profit%': 'PnLPct'
+}
+CSV_NUM_COLS = ('Shares', 'AvgCost', 'MarketPrice', 'MarketValue', 'TotalCost', 'PnL')
+
 def clean_numeric(value):
     if isinstance(value, (int, float)): return float(value)
     try:
@@ -144,34 +156,35 @@ def clean_numeric(value):
         return float(s_val) if s_val else 0.0
     except: return 0.0
 
+def read_csv_fast(src):
+    """
+    Arrow's multithreaded columnar CSV reader; pandas C parser if Arrow can't handle the file.
+    """
+    try:
+        return pd.read_csv(src, engine='pyarrow')
+    except Exception:
+        if hasattr(src, 'seek'): src.seek(0)
+        return pd.read_csv(src)
+
 def process_accounting_csv(uploaded_file):
     # Load demo if no file
     if not uploaded_file:
          try:
-             df = pd.read_csv("Jay Investments - Sheet16.csv")
+             df = read_csv_fast("Jay Investments - Sheet16.csv")
          except:
              return pd.DataFrame(), {}
     else:
-        df = pd.read_csv(uploaded_file)
+        df = read_csv_fast(uploaded_file)
         
     try:
         # 1. Cleaning Headers
         # Remove unnamed columns
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+        df = df.loc[:, ~df.columns.astype(str).str.startswith('Unnamed')]
         # Drop empty columns
         df = df.dropna(axis=1, how='all')
         
-        # Canonical Rename Map (User Hard Spec)
-        rename_map = {
-            'SHARE': 'Shares', 'Share': 'Shares', 
-            'AVG COST': 'AvgCost', 'Avg Cost': 'AvgCost', 
-            'MARKET PRICE': 'MarketPrice', 'Market Price': 'MarketPrice',
-            'Value': 'MarketValue', 'Market Value': 'MarketValue',
-            'TOTAL COST': 'TotalCost', 'Total Cost': 'TotalCost',
-            'PROFIT': 'PnL', 'Profit': 'PnL',
-            'PROFIT%': 'PnLPct', 'Profit%': 'PnLPct'
-        }
-        df.rename(columns=rename_map, inplace=True)
+        # Canonical Rename (see CSV_RENAME_MAP)
+        df.rename(columns=CSV_RENAME_MAP, inplace=True)
         
         # Ensure Ticker exists
         if 'Ticker' not in df.columns: return pd.DataFrame(), {}
@@ -180,8 +193,7 @@ def process_accounting_csv(uploaded_file):
         df['Ticker'] = df['Ticker'].astype(str).str.upper().str.strip()
         
         # 2. Convert Numerics STRICT
-        num_cols = ['Shares', 'AvgCost', 'MarketPrice', 'MarketValue', 'TotalCost', 'PnL']
-        for c in num_cols:
+        for c in CSV_NUM_COLS:
             if c in df.columns:
                 df[c] = df[c].apply(clean_numeric)
             else:
@@ -247,7 +259,8 @@ def render_trade_tab(ticker):
     
     if db_ok:
         st.caption("🟢 Cloud SQL Online")
-        trades = storage.list_trades(user_id, ticker)
+        df_db = storage.list_trades_df(user_id, ticker)
+        trades = storage.trade_records(df_db)
     else:
         st.warning(f"⚠️ Data Offline: {db_msg}. Using Volatile Session State.")
         if 'trades_db' not in st.session_state: st.session_state['trades_db'] = []
@@ -325,7 +338,8 @@ def render_trade_tab(ticker):
     
     # 3. Trade List
     if trades:
-        df_trades = pd.DataFrame(trades)
+        # DB path already has the frame; session-state fallback is a list of dicts
+        df_trades = df_db if db_ok else pd.DataFrame(trades)
         cols = ['datetime', 'action', 'shares', 'price', 'fee', 'note', 'id']
         show_cols = [c for c in cols if c in df_trades.columns]
         df_trades = df_trades[show_cols]
@@ -368,10 +382,13 @@ def main():
     if manual_txt: all_tickers += [x.strip().upper() for x in manual_txt.split(',')]
     all_tickers = sorted(list(set(all_tickers)))
     
+    # Ticker -> context, built column-wise (no per-row Series boxing)
     portfolio_ctx = {}
     if not df_stocks.empty:
-        for _, row in df_stocks.iterrows():
-            portfolio_ctx[row['Ticker']] = {'avg_cost': row['AvgCost']}
+        portfolio_ctx = {
+            t: {'avg_cost': cost}
+            for t, cost in zip(df_stocks['Ticker'].to_numpy(), df_stocks['AvgCost'].to_numpy())
+        }
     
     tab1, tab2 = st.tabs(["🌍 全球戰情 (Dashboard)", "🛠️ 個股分析 (Workbench)"])
     
@@ -482,7 +499,7 @@ def main():
                                  nexus_brain._set_cache(sel_ticker, "report_anal", rep)
                                  st.rerun()
                                  
-                        final_rep = nexus_brain._get_cache_data(sel_ticker, "report_anal") if nexus_brain._is_cache_valid(sel_ticker, "report_anal") else None
+                        final_rep = nexus_brain._cache_get(sel_ticker, "report_anal")
                         if final_rep: 
                             st.markdown(final_rep)
                         else: 
@@ -505,7 +522,7 @@ def main():
                                  nexus_brain._set_cache(sel_ticker, "report_wyckoff", rep)
                                  st.rerun()
                                  
-                        final_wy = nexus_brain._get_cache_data(sel_ticker, "report_wyckoff") if nexus_brain._is_cache_valid(sel_ticker, "report_wyckoff") else None
+                        final_wy = nexus_brain._cache_get(sel_ticker, "report_wyckoff")
                         if final_wy: 
                             st.markdown(final_wy)
                         else: 
@@ -34,12 +34,8 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from typing import Optional
 
-# ─── 交易日曆（optional）────────────────────────────────────────
-try:
-    import pandas_market_calendars as mcal
-    _HAS_MCAL = True
-except ImportError:
-    _HAS_MCAL = False
+# ─── 交易日曆（optional, pandas_market_calendars imported lazily）──
+from utils.nyse_cache import get_schedule
 
 
 # ============================================================
@@ -95,13 +91,10 @@ def _expected_trading_days(start: datetime, end: datetime):
       reliability = True  → NYSE calendar (excludes holidays)
       reliability = False → BDay fallback  (does not exclude holidays)
     """
-    if _HAS_MCAL:
-        try:
-            nyse     = mcal.get_calendar('NYSE')
-            schedule = nyse.schedule(start_date=start, end_date=end)
-            return len(schedule), True
-        except Exception:
-            pass
+    try:
+        return len(get_schedule(start, end)), True
+    except Exception:
+        pass  # ImportError when pandas_market_calendars is missing
 
     # BDay fallback
     bdays = len(pd.date_range(start=start, end=end, freq='B'))
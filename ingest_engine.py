@@ -1,10 +1,83 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
+import orjson
 import time
 import sqlite3
 import os
+import threading
+import concurrent.futures
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timezone
+from itertools import repeat
+from operator import itemgetter
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+# Lets bulk-fetch worker threads keep the session's ScriptRunContext (st.toast etc.)
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    _HAS_ST_CTX = True
+except ImportError:
+    _HAS_ST_CTX = False
+
+PARQUET_DIR = "data"
+PRICE_COLUMNS = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+REQUEST_SPACING = 2.0 # Safe Mode: >= 2s between Finazon request starts (all threads)
+BULK_WORKERS = 8
+_BAR_FIELDS = itemgetter('t', 'o', 'h', 'l', 'c', 'v') # Finazon bar keys, PRICE_COLUMNS order
+
+if _HAS_NUMBA:
+    @njit(cache=True)
+    def _boxcar(x, w):
+        """
+        Single-pass running-sum boxcar. NaNs are counted, not summed, so they
+        only blank the windows that contain them (no fastmath: it drops NaN checks).
+        """
+        n = x.shape[0]
+        out = np.empty(n)
+        s = 0.0
+        nans = 0
+        for i in range(n):
+            if np.isnan(x[i]): nans += 1
+            else: s += x[i]
+            if i >= w:
+                if np.isnan(x[i - w]): nans -= 1
+                else: s -= x[i - w]
+            out[i] = s / w if (i >= w - 1 and nans == 0) else np.nan
+        return out
+
+def _rolling_mean(x, w):
+    """
+    Trailing w-window mean over a float array, NaN for the first w-1 points
+    (same as Series.rolling(w).mean(); a NaN only poisons windows containing it).
+    """
+    if _HAS_NUMBA:
+        return _boxcar(x, w)
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= w:
+        out[w - 1:] = np.convolve(x, np.ones(w) / w, mode='valid')
+    return out
+
+class _NoPriceData(Exception):
+    """Raised inside the cached loader so empty results are never cached."""
+    pass
+
+@st.cache_data(ttl=3600, max_entries=256)
+def _cached_price_data(_engine, ticker, dataset, db_path):
+    """
+    Rerun-safe memo of sync_ticker. `_engine` is excluded from the cache key
+    (st.cache_data can't hash self); dataset/db_path keep keys engine-specific.
+    """
+    df = _engine.sync_ticker(ticker)
+    if df.empty:
+        raise _NoPriceData(ticker)
+    return df
 
 class MarketDataEngine:
     """
@@ -22,6 +95,13 @@ class MarketDataEngine:
             self.api_key = ""
             self.dataset = "us_stocks_essential"
             
+        # Keep-alive HTTP session (TLS handshake paid once per host, not per ticker)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self._session.mount("https://", adapter)
+        self._throttle_lock = threading.Lock()
+        self._next_request_at = 0.0
+            
         # Initialize Local DB
         self.db_path = "market_data.db"
         self._init_db()
@@ -47,8 +127,36 @@ class MarketDataEngine:
         return result if result else 0
 
     def get_price_data(self, ticker):
-        """Wrapper for backward compatibility with app.py"""
-        return self.sync_ticker(ticker)
+        """Wrapper for backward compatibility with app.py (cached 1h per ticker)"""
+        try:
+            return _cached_price_data(self, ticker, self.dataset, self.db_path)
+        except _NoPriceData:
+            return pd.DataFrame()
+
+    def get_price_data_bulk(self, tickers):
+        """
+        Concurrent get_price_data over many tickers: {ticker: DataFrame}.
+        Network waits overlap; the shared throttle still spaces API calls.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers: return {}
+        
+        # Without the caller's context, st.toast (429 warning) is a no-op on workers
+        ctx = get_script_run_ctx() if _HAS_ST_CTX else None
+        init = (lambda: add_script_run_ctx(threading.current_thread(), ctx)) if ctx else None
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(BULK_WORKERS, len(tickers)), initializer=init) as ex:
+            futures = {t: ex.submit(self.get_price_data, t) for t in tickers}
+            return {t: f.result() for t, f in futures.items()}
+
+    def _throttle(self):
+        """Reserve the next request slot; sleeps outside the lock so other threads can queue"""
+        with self._throttle_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + REQUEST_SPACING
+        if start_at > now:
+            time.sleep(start_at - now)
 
     def sync_ticker(self, ticker):
         """
@@ -72,8 +180,8 @@ class MarketDataEngine:
         
         print(f"[{ticker}] Fetching from Finazon (Start: {start_at})...")
         
-        # Rate Limit Sleep (Safe Mode: 1 request every 2 seconds to stay under limits)
-        time.sleep(2.0) 
+        # Rate Limit (Safe Mode: 1 request every 2 seconds to stay under limits)
+        self._throttle()
 
         url = "https://api.finazon.io/latest/time_series"
         params = {
@@ -86,24 +194,36 @@ class MarketDataEngine:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=15)
+            response = self._session.get(url, params=params, timeout=15)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if "data" in data and data["data"]:
                     # 3. Save to DB
-                    new_records = []
-                    for d in data["data"]:
-                        new_records.append((
-                            ticker.upper(), d['t'], d['o'], d['h'], d['l'], d['c'], d['v']
-                        ))
+                    # AoS -> SoA: one C-level itemgetter pass, then typed columns
+                    sym = ticker.upper()
+                    t, o, h, l, c, v = zip(*map(_BAR_FIELDS, data["data"]))
+                    new_records = list(zip(repeat(sym, len(t)), t, o, h, l, c, v))
                     
                     conn = sqlite3.connect(self.db_path)
-                    c = conn.cursor()
-                    c.executemany("INSERT INTO prices VALUES (?,?,?,?,?,?,?)", new_records)
+                    conn.executemany("INSERT INTO prices VALUES (?,?,?,?,?,?,?)", new_records)
                     conn.commit()
                     conn.close()
                     print(f"[{ticker}] Saved {len(new_records)} new candles.")
+                    
+                    # Dual-write to Parquet while SQLite remains the legacy path
+                    try:
+                        self.save_parquet(pd.DataFrame({
+                            'ticker': sym,
+                            'timestamp': np.asarray(t, dtype=np.int64),
+                            'open': np.asarray(o, dtype=np.float64),
+                            'high': np.asarray(h, dtype=np.float64),
+                            'low': np.asarray(l, dtype=np.float64),
+                            'close': np.asarray(c, dtype=np.float64),
+                            'volume': np.asarray(v, dtype=np.float64),
+                        }, columns=PRICE_COLUMNS), ticker)
+                    except Exception as e:
+                        print(f"[{ticker}] Parquet Write Skipped: {e}")
             elif response.status_code == 429:
                 st.toast(f"⚠️ API Rate Limit Hit for {ticker}. Slowing down...")
                 time.sleep(5)
@@ -117,26 +237,87 @@ class MarketDataEngine:
         return self.load_from_db(ticker)
 
     def load_from_db(self, ticker):
-        """Read full history from SQLite"""
+        """
+        Full history. Served from the Parquet mirror when it holds every SQLite
+        row (columnar read); otherwise read from SQLite and backfill the mirror.
+        """
         conn = sqlite3.connect(self.db_path)
-        # Read and sort by timestamp
-        df = pd.read_sql(f"SELECT * FROM prices WHERE ticker='{ticker}' ORDER BY timestamp ASC", conn)
-        conn.close()
+        try:
+            n, last_ts = conn.execute(
+                "SELECT COUNT(*), MAX(timestamp) FROM prices WHERE ticker=?", (ticker,)
+            ).fetchone()
+            if not n: return pd.DataFrame()
+            
+            try:
+                df = self.get_parquet(ticker, 0, last_ts)
+                if len(df) == n: return df
+            except Exception as e:
+                print(f"[{ticker}] Parquet Read Skipped: {e}")
+            
+            # Read and sort by timestamp
+            df = pd.read_sql("SELECT * FROM prices WHERE ticker=? ORDER BY timestamp ASC", conn, params=(ticker,))
+        finally:
+            conn.close()
         
-        if df.empty: return pd.DataFrame()
+        # One-time backfill: history synced before the dual-write existed
+        try:
+            self.save_parquet(df[PRICE_COLUMNS], ticker)
+        except Exception as e:
+            print(f"[{ticker}] Parquet Backfill Skipped: {e}")
 
         # Processing
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return self._add_indicators(df)
+
+    def _parquet_path(self, symbol):
+        return os.path.join(PARQUET_DIR, f"{symbol.upper()}_1d.parquet")
+
+    def save_parquet(self, df, symbol):
+        """
+        Append candles to data/{symbol}_1d.parquet (columnar, ZSTD).
+        Existing rows are merged and de-duplicated on timestamp (newest wins),
+        same semantics as the SQLite ON CONFLICT REPLACE.
+        """
+        path = self._parquet_path(symbol)
+        os.makedirs(PARQUET_DIR, exist_ok=True)
+        if os.path.exists(path):
+            df = pd.concat([pd.read_parquet(path, engine='pyarrow'), df], ignore_index=True)
+        df = df.drop_duplicates(subset='timestamp', keep='last').sort_values('timestamp')
+        
+        # Write-then-rename so a crash never leaves a truncated file
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        os.replace(tmp_path, path)
+
+    def get_parquet(self, symbol, start, end):
+        """
+        Read candles with start <= timestamp <= end (epoch seconds).
+        Filters are pushed down so non-matching row groups are skipped.
+        """
+        path = self._parquet_path(symbol)
+        if not os.path.exists(path): return pd.DataFrame()
+        
+        df = pd.read_parquet(
+            path, engine='pyarrow',
+            filters=[('timestamp', '>=', start), ('timestamp', '<=', end)]
+        )
+        if df.empty: return pd.DataFrame()
         
-        # Indicators
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        df['MA100'] = df['close'].rolling(window=100).mean()
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return self._add_indicators(df)
+
+    def _add_indicators(self, df):
+        """MA20 / MA100 / RSI(14) on the close column"""
+        close = df['close'].to_numpy(dtype=np.float64)
+        df['MA20'] = _rolling_mean(close, 20)
+        df['MA100'] = _rolling_mean(close, 100)
         
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        delta = np.diff(close, prepend=np.nan)
+        gain = _rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+        loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = gain / loss
+            df['RSI'] = 100 - (100 / (1 + rs))
         
         return df
 
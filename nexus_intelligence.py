@@ -1,9 +1,60 @@
 import streamlit as st
 import time
-import json
+import re
+import hashlib
+import threading
+import weakref
+import orjson
 import requests
-import google.generativeai as genai
-from datetime import datetime, timedelta
+from cachetools import TTLCache
+
+# ─── Fast non-cryptographic hash（optional）─────────────────────
+try:
+    import xxhash
+    _HAS_XXHASH = True
+except ImportError:
+    _HAS_XXHASH = False
+
+_WS_RE = re.compile(r'[ \t]+')  # spaces/tabs only: row breaks carry table structure
+
+# Streamlit may touch the cache from several session threads
+_CACHE_LOCK = threading.Lock()
+SWEEP_INTERVAL = 300 # seconds
+
+def _sweeper(cache_ref):
+    """Periodically evicts expired nexus_cache entries; exits once the cache is gone."""
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        cache = cache_ref()
+        if cache is None:
+            return
+        with _CACHE_LOCK:
+            cache.expire()
+        del cache
+
+def _fingerprint(s):
+    """16-hex content key: xxh3_64 when available, else blake2b(digest_size=8)."""
+    b = s.encode('utf-8')
+    if _HAS_XXHASH:
+        return xxhash.xxh3_64(b).hexdigest()
+    return hashlib.blake2b(b, digest_size=8).hexdigest()
+
+def _compress_context(s, max_chars=4000, label="evidence", keep_tail=False):
+    """
+    Collapses runs of spaces/tabs (newlines kept) and caps length of prompt
+    context (fewer tokens in). keep_tail keeps the END (newest rows of a
+    chronological table). Prefixed with a short _fingerprint of the normalized
+    text so truncated contexts stay distinguishable for caching.
+    """
+    if not s:
+        return ""
+    norm = _WS_RE.sub(' ', str(s)).strip()
+    body = norm[-max_chars:] if keep_tail else norm[:max_chars]
+    return f"# {label}_hash: {_fingerprint(norm)[:8]}\n{body}"
+
+class GateFail(Exception):
+    """Raised by a boot gate; the message becomes RALPH_STATUS['reason']."""
+    pass
 
 class NexusIntelligence:
     """
@@ -24,17 +75,12 @@ class NexusIntelligence:
     REQUIRED_TABS = ["📈 線圖 (Chart)", "📋 分析報告 (Report)", "🧙‍♂️ 威科夫 (Wyckoff)", "📝 交易紀錄 (Trade Log)"]
     
     CACHE_DURATION = 21600 # 6 hours
+    CACHE_MAXSIZE = 256
+    
+    _genai = None # google.generativeai, imported on first use (~200ms + grpc)
     
     def __init__(self):
-        if 'nexus_cache' not in st.session_state:
-            st.session_state['nexus_cache'] = {}
-        if 'RALPH_STATUS' not in st.session_state:
-            st.session_state['RALPH_STATUS'] = {
-                'gemini_ok': False,
-                'model': None,
-                'reason': 'Not Initialized',
-                'sdk_version': 'Unknown'
-            }
+        self._ensure_state()
 
     # ==========================================
     # 🔒 BOOT GATE (RALPH LOOP)
@@ -45,81 +91,87 @@ class NexusIntelligence:
         Should be called at app startup.
         """
         self._ensure_state()
+        st.session_state['RALPH_STATUS'] = self._run_gates()
+
+    def _run_gates(self):
+        """
+        Pure status builder: runs gates in order, stops at the first failure.
+        Returns the RALPH_STATUS dict (no session_state writes).
+        """
         status = {'gemini_ok': False, 'model': None, 'reason': '', 'sdk_version': 'Unknown'}
-        
+        try:
+            g_key = self._gate_secrets()
+            status['sdk_version'] = self._gate_sdk()
+            target_model = self._gate_models(g_key)
+            self._gate_smoke(target_model)
+            self._gate_ui()
+        except GateFail as e:
+            status['reason'] = str(e)
+            return status
+
+        # ALL GATES PASSED
+        status['gemini_ok'] = True
+        status['model'] = target_model
+        status['reason'] = 'RALPH_OK'
+        return status
+
+    def _gate_secrets(self):
         # Gate 1: Secrets
         _, g_key = self._get_api_keys()
         if not g_key:
-            status['reason'] = 'Gate 1 Fail: Missing API Key'
-            st.session_state['RALPH_STATUS'] = status
-            return
-            
+            raise GateFail('Gate 1 Fail: Missing API Key')
+        return g_key
+
+    def _gate_sdk(self):
         # Gate 2: SDK
         try:
-            status['sdk_version'] = genai.__version__
-        except:
-             status['reason'] = 'Gate 2 Fail: SDK Error'
-             st.session_state['RALPH_STATUS'] = status
-             return
+            return self._sdk().__version__
+        except Exception:
+            raise GateFail('Gate 2 Fail: SDK Error')
 
+    def _gate_models(self, g_key):
         # Gate 3: Model Discovery
-        target_model = None
         try:
+            genai = self._sdk()
             genai.configure(api_key=g_key)
             all_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            
-            if not all_models:
-                status['reason'] = 'Gate 3 Fail: No Capable Models Found'
-                st.session_state['RALPH_STATUS'] = status
-                return
-                
-            # Priority Selection
-            priorities = [
-                 'models/gemini-2.0-flash-exp',
-                 'models/gemini-1.5-flash',
-                 'models/gemini-1.5-flash-latest',
-                 'models/gemini-1.5-pro'
-            ]
-            
-            for p in priorities:
-                if p in all_models:
-                    target_model = p
-                    break
-            
-            if not target_model:
-                 # Fallback to first available flash or just first
-                 flash = next((m for m in all_models if 'flash' in m), None)
-                 target_model = flash if flash else all_models[0]
-                 
         except Exception as e:
-            status['reason'] = f'Gate 3 Fail: {str(e)}'
-            st.session_state['RALPH_STATUS'] = status
-            return
+            raise GateFail(f'Gate 3 Fail: {str(e)}')
+
+        if not all_models:
+            raise GateFail('Gate 3 Fail: No Capable Models Found')
 
+        # Priority Selection
+        priorities = [
+             'models/gemini-2.0-flash-exp',
+             'models/gemini-1.5-flash',
+             'models/gemini-1.5-flash-latest',
+             'models/gemini-1.5-pro'
+        ]
+        for p in priorities:
+            if p in all_models:
+                return p
+
+        # Fallback to first available flash or just first
+        flash = next((m for m in all_models if 'flash' in m), None)
+        return flash if flash else all_models[0]
+
+    def _gate_smoke(self, target_model):
         # Gate 4: Smoke Test
         try:
-            model = genai.GenerativeModel(target_model)
+            model = self._sdk().GenerativeModel(target_model)
             res = model.generate_content("Ping", generation_config={"max_output_tokens": 5})
-            if not res or not res.text:
-                status['reason'] = 'Gate 4 Fail: Empty Response'
-                st.session_state['RALPH_STATUS'] = status
-                return
+            # res.text raises ValueError when the response has no Part — stays in the try
+            text = res.text if res else None
         except Exception as e:
-            status['reason'] = f'Gate 4 Fail: {str(e)}'
-            st.session_state['RALPH_STATUS'] = status
-            return
+            raise GateFail(f'Gate 4 Fail: {str(e)}')
+        if not text:
+            raise GateFail('Gate 4 Fail: Empty Response')
 
+    def _gate_ui(self):
         # Gate 5: UI Integrity (Survivability)
         if not self.check_ui_integrity():
-            status['reason'] = 'Gate 5 Fail: UI Integrity Violation'
-            st.session_state['RALPH_STATUS'] = status
-            return
-            
-        # ALL GATES PASSED
-        status['gemini_ok'] = True
-        status['model'] = target_model
-        status['reason'] = 'RALPH_OK'
-        st.session_state['RALPH_STATUS'] = status
+            raise GateFail('Gate 5 Fail: UI Integrity Violation')
 
     def check_ui_integrity(self):
         """
@@ -137,7 +189,7 @@ class NexusIntelligence:
     # ==========================================
     def _ensure_state(self):
         if 'nexus_cache' not in st.session_state:
-            st.session_state['nexus_cache'] = {}
+            st.session_state['nexus_cache'] = self._new_cache()
         if 'RALPH_STATUS' not in st.session_state:
             st.session_state['RALPH_STATUS'] = {
                 'gemini_ok': False,
@@ -146,33 +198,45 @@ class NexusIntelligence:
                 'sdk_version': 'Unknown'
             }
 
+    @classmethod
+    def _sdk(cls):
+        if cls._genai is None:
+            import google.generativeai as genai
+            cls._genai = genai
+        return cls._genai
+
     def _get_api_keys(self):
         p_key = st.secrets.get("PERPLEXITY_KEY") or st.secrets.get("PERPLEXITY_API_KEY")
         g_key = st.secrets.get("GEMINI_KEY") or st.secrets.get("GEMINI_API_KEY")
         return p_key, g_key
 
+    def _new_cache(self):
+        """Bounded TTL cache keyed by (ticker, content_type), swept in the background."""
+        cache = TTLCache(maxsize=self.CACHE_MAXSIZE, ttl=self.CACHE_DURATION)
+        threading.Thread(target=_sweeper, args=(weakref.ref(cache),), daemon=True).start()
+        return cache
+
     def _is_cache_valid(self, ticker, content_type):
         self._ensure_state()
-        cache = st.session_state['nexus_cache'].get(ticker, {}).get(content_type)
-        if not cache: return False
-        age = time.time() - cache['timestamp']
-        return age < self.CACHE_DURATION
+        with _CACHE_LOCK:
+            return (ticker, content_type) in st.session_state['nexus_cache']
 
-    def _get_cached_content(self, ticker, content_type):
+    def _cache_get(self, ticker, content_type):
+        """One locked lookup: the value, or None if missing / TTL-expired."""
         self._ensure_state()
-        return st.session_state['nexus_cache'][ticker][content_type]['data']
+        with _CACHE_LOCK:
+            return st.session_state['nexus_cache'].get((ticker, content_type))
+
+    def _get_cached_content(self, ticker, content_type):
+        return self._cache_get(ticker, content_type)
         
     def _get_cache_data(self, ticker, content_type):
         return self._get_cached_content(ticker, content_type)
 
     def _set_cache(self, ticker, content_type, data):
         self._ensure_state()
-        if ticker not in st.session_state['nexus_cache']:
-            st.session_state['nexus_cache'][ticker] = {}
-        st.session_state['nexus_cache'][ticker][content_type] = {
-            'timestamp': time.time(),
-            'data': data
-        }
+        with _CACHE_LOCK:
+            st.session_state['nexus_cache'][(ticker, content_type)] = data
 
     # ==========================================
     # 🧠 STAGE 1: PERPLEXITY (EVIDENCE)
@@ -190,8 +254,9 @@ class NexusIntelligence:
         if not p_key:
             return {"status": "BLOCKED", "error": "Missing Perplexity Key", "data": None}
             
-        if self._is_cache_valid(ticker, "evidence"):
-             return {"status": "READY", "source": "CACHE", "data": self._get_cached_content(ticker, "evidence")}
+        cached = self._cache_get(ticker, "evidence")
+        if cached is not None:
+             return {"status": "READY", "source": "CACHE", "data": cached}
              
         # Perplexity Live Rate Limit: 1 per 6 hours enforced by cache check above + app logic
         
@@ -219,9 +284,9 @@ class NexusIntelligence:
             }
             headers = {"Authorization": f"Bearer {p_key}", "Content-Type": "application/json"}
             
-            res = requests.post(url, json=payload, headers=headers, timeout=25)
+            res = requests.post(url, data=orjson.dumps(payload), headers=headers, timeout=25)
             if res.status_code == 200:
-                raw_txt = res.json()['choices'][0]['message']['content']
+                raw_txt = orjson.loads(res.content)['choices'][0]['message']['content']
                 self._set_cache(ticker, "evidence", raw_txt)
                 return {"status": "READY", "source": "LIVE", "data": raw_txt}
             else:
@@ -244,6 +309,8 @@ class NexusIntelligence:
         _, g_key = self._get_api_keys()
         
         # Build Context
+        evidence_data = _compress_context(evidence_data)
+        ohlcv_context = _compress_context(ohlcv_context, label="ohlcv", keep_tail=True)
         invalidation = ""
         user_profile = "Context: Long-term (6-12m), Max Drawdown 20%."
         
@@ -288,10 +355,12 @@ class NexusIntelligence:
             5. **策略建議 (Strategy)**: Conditional approach.
             """
             
+        full_prompt = f"ROLE: {role}\nTASK: {task}"
+        
         try:
+            genai = self._sdk()
             genai.configure(api_key=g_key)
             model = genai.GenerativeModel(target_model)
-            full_prompt = f"ROLE: {role}\nTASK: {task}"
             res = model.generate_content(full_prompt)
             return res.text
         except Exception as e:
@@ -1,17 +1,92 @@
 import pandas as pd
 import numpy as np
 import datetime
-from chart_engine import ChartPipelineV2, ChartContext, Resolution
-import pandas_market_calendars as mcal
+from chart_engine import ChartPipelineV2, ChartContext, Resolution, PERIOD_DAYS as _PERIOD_DAYS
+import functools
+import concurrent.futures
 import logging
+import weakref
+from collections import OrderedDict
+from utils.nyse_cache import get_schedule
+
+# ─── Numba（optional）: fused single-pass G6 kernel ────────────────
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
 
 # Configure logging to stdout
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger("RalphLoop")
 
+_NS_PER_DAY = 86_400_000_000_000
+
 class RalphGateFailure(Exception):
     pass
 
+@functools.lru_cache(maxsize=64)
+def _nyse_schedule(start_iso: str, end_iso: str) -> int:
+    """
+    Number of NYSE sessions in [start_iso, end_iso].
+    Sliced from the incremental schedule cache (utils/nyse_cache.py).
+    """
+    return len(get_schedule(start_iso, end_iso))
+
+# id(df) -> (weakref(df), arrays); the weakref guards against id() reuse
+_OHLC_CACHE = OrderedDict()
+_OHLC_CACHE_SIZE = 4
+
+def _ohlc_arrays(df):
+    """
+    (open, high, low, close) as C-contiguous float64 arrays.
+    Memoized per DataFrame object so repeated gate passes share one extraction
+    (callers must treat df as read-only).
+    """
+    hit = _OHLC_CACHE.get(id(df))
+    if hit is not None and hit[0]() is df:
+        return hit[1]
+
+    arrays = tuple(
+        np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+        for col in ('Open', 'High', 'Low', 'Close')
+    )
+    _OHLC_CACHE[id(df)] = (weakref.ref(df), arrays)
+    while len(_OHLC_CACHE) > _OHLC_CACHE_SIZE:
+        _OHLC_CACHE.popitem(last=False)
+    return arrays
+
+if _HAS_NUMBA:
+    @njit(cache=True)
+    def _validate_ohlc(o, h, l, c):
+        """
+        One sweep over the four arrays: (violation count, first bad index or -1).
+        A NaN open or close is skipped in favour of the other side (np.fmin/fmax
+        semantics); only rows with both NaN are skipped entirely.
+        """
+        n = o.shape[0]
+        cnt = 0
+        first = -1
+        for i in range(n):
+            oi = o[i]
+            ci = c[i]
+            if oi != oi:
+                if ci != ci:
+                    continue
+                mn = ci
+                mx = ci
+            elif ci != ci:
+                mn = oi
+                mx = oi
+            else:
+                mn = oi if oi < ci else ci
+                mx = oi if oi > ci else ci
+            if l[i] > mn or h[i] < mx:
+                cnt += 1
+                if first < 0:
+                    first = i
+        return cnt, first
+
 def check_gate(gate_name, condition, error_msg):
     if not condition:
         raise RalphGateFailure(f"[{gate_name}] FAIL: {error_msg}")
@@ -29,12 +104,16 @@ def validate_dataframe(df, context: ChartContext, expected_trading_days, missing
     if df.index.tz is not None:
         raise RalphGateFailure("[G1] Index is not timezone-naive (must be UTC naive)")
     
+    # Raw int64 nanoseconds (tz-naive checked above, so floor-div maps to the UTC calendar day)
+    ns = df.index.values.astype('datetime64[ns]', copy=False).view('i8')
+    days_ns = ns // _NS_PER_DAY
+
     # Check normalization (no seconds/ms for 1d, though resolution might vary. User said 1d for some gates)
     if context.interval == Resolution.DAILY:
         # Check if any timestamp has non-zero time (h/m/s/ms)
         # We expect normalized dates for 1d
-        re_normalized = df.index.normalize()
-        if not df.index.equals(re_normalized):
+        # Any remainder past midnight == time component (no normalized copy needed)
+        if (ns % _NS_PER_DAY).any():
              # It's acceptable if the pipeline returns UTC times (e.g. 05:00 for UTC open) but user said:
              # "normalize() to trading day" for gap/coverage calculation. 
              # However, the final DF might have valid UTC timestamps. 
@@ -46,7 +125,9 @@ def validate_dataframe(df, context: ChartContext, expected_trading_days, missing
              logger.warning("[G1] 1d data has time components. Verifying if they are consistent...")
 
     # --- G3: Range & Completeness (Fail Fast) ---
-    unique_days = len(df.index.normalize().unique())
+    # One pass yields both the G3 day count and the G5 per-day duplicate flag
+    u, counts = np.unique(days_ns, return_counts=True)
+    unique_days = int(u.size)
     logger.info(f"Unique Trading Days: {unique_days}")
     
     period_thresholds = {
@@ -61,16 +142,32 @@ def validate_dataframe(df, context: ChartContext, expected_trading_days, missing
 
     # --- G5: Uniqueness Gate ---
     # (symbol, interval, trading_day_utc) must be unique
-    # Since this is a DF for one symbol/interval, index uniqueness is the proxy
-    check_gate("G5", df.index.is_unique, "Duplicate timestamps found in index")
+    # Since this is a DF for one symbol/interval, index uniqueness is the proxy.
+    # For 1d the per-day counts from G3 answer it directly; intraday needs the full index.
+    if context.interval == Resolution.DAILY:
+        has_dup = bool(counts.max() > 1) if counts.size else False
+    else:
+        has_dup = not df.index.is_unique
+    check_gate("G5", not has_dup, "Duplicate timestamps found in index")
 
     # --- G6: OHLC Semantic Gate ---
     # low <= min(open, close)
-    invalid_ohlc = df[
-        (df['Low'] > df[['Open', 'Close']].min(axis=1)) | 
-        (df['High'] < df[['Open', 'Close']].max(axis=1))
-    ]
-    invalid_count = len(invalid_ohlc)
+    o, hi, lo, c = _ohlc_arrays(df)
+    if _HAS_NUMBA:
+        # First call pays JIT compile (cached to __pycache__), then near-C speed
+        invalid_count, first_bad = _validate_ohlc(o, hi, lo, c)
+        if invalid_count:
+            logger.error(f"[G6] First bad row at {df.index[first_bad]}")
+    else:
+        # fmin/fmax skip a NaN side (like DataFrame.min(axis=1)); np.minimum would propagate it
+        bad = (lo > np.fmin(o, c)) | (hi < np.fmax(o, c))
+        
+        # Clean path (expected): nothing beyond the bool mask. Diagnostics only on failure.
+        invalid_count = 0
+        if bad.any():
+            idx = np.flatnonzero(bad)
+            invalid_count = int(idx.size)
+            logger.error(f"[G6] Bad rows at {df.index[idx[:5]].tolist()}")
     logger.info(f"Invalid OHLC Count: {invalid_count}")
     
     # The requirement says "Must count invalid... drop must re-calc coverage". 
@@ -89,17 +186,32 @@ def run_ralph_loop_test(symbol="AMZN", period="1y"):
     logger.info("Starting Ralph Loop Verification...")
     
     # Load secrets
-    import toml
     try:
-        secrets = toml.load(".streamlit/secrets.toml")
+        try:
+            import tomllib # stdlib, Python 3.11+
+            with open(".streamlit/secrets.toml", "rb") as f:
+                secrets = tomllib.load(f)
+        except ImportError:
+            import toml
+            secrets = toml.load(".streamlit/secrets.toml")
         finazon_key = secrets.get("FINAZON_KEY")
-    except:
+    except (FileNotFoundError, ValueError):
         logger.warning("No secrets.toml found. API calls will be skipped (expect Failures).")
         finazon_key = None
 
     # Setup Context
     context = ChartContext(symbol=symbol, interval=Resolution.DAILY, period=period, finazon_key=finazon_key)
     
+    # G2 reference range (ChartPipelineV2 logic for start date: same period table, 365 default)
+    end_date = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - datetime.timedelta(days=_PERIOD_DAYS.get(period, 365))
+    
+    # The G2 schedule lookup doesn't depend on the pipeline: resolve it in the
+    # background while the pipeline runs. Gates are still checked (and logged) in order.
+    ex = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    f_sched = ex.submit(_nyse_schedule, start_date.date().isoformat(), end_date.date().isoformat())
+    ex.shutdown(wait=False)
+    
     # Run Pipeline
     pipeline = ChartPipelineV2(context)
     
@@ -127,21 +239,8 @@ def run_ralph_loop_test(symbol="AMZN", period="1y"):
     logger.info(f"Source: {source}")
     
     # --- G2: Trading Calendar Gate ---
-    # Verify expected_days matches mcal
-    nyse = mcal.get_calendar('NYSE')
-    end_date = datetime.datetime.utcnow().replace(hour=0,minute=0,second=0,microsecond=0)
-    
-    # Re-calculate expected range to verify pipeline's math
-    # ChartPipelineV2 logic for start date:
-    if period == "1y":
-        start_date = end_date - datetime.timedelta(days=365)
-    elif period == "3mo":
-        start_date = end_date - datetime.timedelta(days=90)
-    else:
-        start_date = end_date - datetime.timedelta(days=365) # default
-        
-    schedule = nyse.schedule(start_date=start_date, end_date=end_date)
-    mcal_expected_count = len(schedule)
+    # Verify expected_days matches mcal (re-calculated range, resolved above)
+    mcal_expected_count = f_sched.result()
     
     # We allow small variation due to "today" inclusion/exclusion depending on exact time
     # But it should be very close.
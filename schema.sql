@@ -32,7 +32,11 @@ CREATE TABLE IF NOT EXISTS trades (
 );
 
 -- Indexes
-CREATE INDEX IF NOT EXISTS idx_trades_user_ticker_dt ON trades (user_id, ticker, datetime DESC);
+-- Covering (INCLUDE) so list_trades can be answered by an index-only scan
+CREATE INDEX IF NOT EXISTS idx_trades_user_ticker_dt_incl ON trades (user_id, ticker, datetime DESC)
+    INCLUDE (id, action, shares, price, fee, note);
+-- Superseded non-covering index (same key): drop so inserts maintain one B-tree
+DROP INDEX IF EXISTS idx_trades_user_ticker_dt;
 
 -- Seed Data (Optional)
 INSERT INTO users (id, email) VALUES ('local', 'admin@nexus.ai') ON CONFLICT (id) DO NOTHING;
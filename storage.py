@@ -1,31 +1,53 @@
 
 import streamlit as st
+import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, insert, table, column
 import logging
 import uuid
+import time
 import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("storage")
 
-# Global Engine Pool
-_db_engine = None
+# Statements are parsed once at import, not per call
+_SELECT_1 = text("SELECT 1")
+_TRADE_COLUMNS = ("id", "user_id", "ticker", "datetime", "action", "shares", "price", "fee", "note")
+_TRADE_SELECT = ", ".join(_TRADE_COLUMNS)
+# Explicit column list (not SELECT *) so idx_trades_user_ticker_dt_incl covers the query
+_LIST_TRADES_ALL = text(
+    f"SELECT {_TRADE_SELECT} FROM trades WHERE user_id = :user_id ORDER BY datetime DESC"
+)
+_LIST_TRADES_TICKER = text(
+    f"SELECT {_TRADE_SELECT} FROM trades WHERE user_id = :user_id AND ticker = :ticker ORDER BY datetime DESC"
+)
+_TRADES = table("trades", *(column(c) for c in _TRADE_COLUMNS))
+_INSERT_TRADES = insert(_TRADES).returning(_TRADES.c.id)
+BULK_PAGE_SIZE = 500 # rows per multi-VALUES INSERT (9 binds/row, well under pg's 32767 limit)
+_DELETE_TRADE = text("DELETE FROM trades WHERE id = :id AND user_id = :user_id")
+# Covering index for list_trades: index-only scan for (user_id, ticker) ordered by datetime
+_ENSURE_TRADES_INDEX = text(
+    "CREATE INDEX IF NOT EXISTS idx_trades_user_ticker_dt_incl "
+    "ON trades (user_id, ticker, datetime DESC) INCLUDE (id, action, shares, price, fee, note)"
+)
+# Superseded by the covering index above; a second B-tree on the same key only slows inserts
+_DROP_OLD_TRADES_INDEX = text("DROP INDEX IF EXISTS idx_trades_user_ticker_dt")
+_index_ready = False
 
 class StorageError(Exception):
     pass
 
-def init_connection():
+@st.cache_resource
+def _get_engine():
     """
-    Initialize Cloud SQL connection using streamlit secrets.
+    Build the Cloud SQL engine (and its QueuePool) once, shared by every
+    session and rerun; later calls check connections out of the same pool.
     Expects [postgres] section in secrets.toml with:
     host, port, dbname, user, password
+    Raises StorageError on failure (not cached, so the next call retries).
     """
-    global _db_engine
-    if _db_engine:
-        return _db_engine
-
     try:
         # Check secrets
         if "postgres" not in st.secrets:
@@ -46,89 +68,156 @@ def init_connection():
             database=conf["dbname"],
         )
         
-        _db_engine = create_engine(db_url, pool_pre_ping=True)
+        # Recycle before Cloud SQL drops idle connections
+        engine = create_engine(
+            db_url, pool_pre_ping=True,
+            pool_size=5, max_overflow=10, pool_recycle=1800
+        )
         logger.info("✅ Cloud SQL Connection Established")
-        return _db_engine
+        return engine
 
     except Exception as e:
         logger.error(f"❌ DB Connection Failed: {e}")
+        raise StorageError(str(e)) from e
+
+def init_connection():
+    """
+    Backward-compatible wrapper: returns the shared engine, or None on failure.
+    """
+    try:
+        return _get_engine()
+    except StorageError:
         return None
 
+STATUS_TTL = 30 # seconds a healthy check is reused across reruns
+_STATUS_CACHE = {}
+
 def check_db_status():
     """
-    Returns (status_bool, message)
+    Returns (status_bool, message). A healthy result is reused for STATUS_TTL
+    seconds; failures are never cached so recovery shows up on the next rerun.
     """
-    engine = init_connection()
-    if not engine:
+    now = time.monotonic()
+    hit = _STATUS_CACHE.get('v')
+    if hit and now - hit[0] < STATUS_TTL:
+        return hit[1]
+    
+    res = _check_db_status()
+    if res[0]:
+        _STATUS_CACHE['v'] = (now, res)
+    return res
+
+def _check_db_status():
+    try:
+        engine = _get_engine()
+    except StorageError:
         return False, "Configuration Missing or Connection Failed"
     
     try:
         with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return True, "Online"
+            conn.execute(_SELECT_1)
     except Exception as e:
         return False, str(e)
+    
+    _ensure_index(engine)
+    return True, "Online"
+
+def _ensure_index(engine):
+    """
+    Idempotent CREATE INDEX on first successful connect, then drops the old
+    non-covering index (same transaction, so only once the new one exists).
+    A failure (e.g. no DDL privilege) is logged and never takes the DB offline.
+    """
+    global _index_ready
+    if _index_ready: return
+    try:
+        with engine.begin() as conn:
+            conn.execute(_ENSURE_TRADES_INDEX)
+            conn.execute(_DROP_OLD_TRADES_INDEX)
+        _index_ready = True
+    except Exception as e:
+        logger.warning(f"Index check skipped: {e}")
+        _index_ready = True # don't retry DDL on every status check
 
 # =========================================================
 # 📝 CRUD Operations
 # =========================================================
 
-def list_trades(user_id, ticker=None):
-    engine = init_connection()
-    if not engine: return []
-    
+def list_trades_df(user_id, ticker=None):
+    """
+    Trades as one columnar DataFrame, built by pandas straight from the cursor.
+    """
     try:
-        query = "SELECT * FROM trades WHERE user_id = :user_id"
-        params = {"user_id": user_id}
-        
+        engine = _get_engine()
         if ticker:
-            query += " AND ticker = :ticker"
-            params["ticker"] = ticker
-            
-        query += " ORDER BY datetime DESC"
+            stmt, params = _LIST_TRADES_TICKER, {"user_id": user_id, "ticker": ticker}
+        else:
+            stmt, params = _LIST_TRADES_ALL, {"user_id": user_id}
         
         with engine.connect() as conn:
-            result = conn.execute(text(query), params)
-            # Convert to list of dicts
-            trades = [dict(row._mapping) for row in result]
-            return trades
+            return pd.read_sql(stmt, conn, params=params)
     except Exception as e:
         logger.error(f"list_trades Error: {e}")
-        return []
+        return pd.DataFrame()
+
+def trade_records(df):
+    """
+    DataFrame -> list of dicts with driver-style values: NULL stays None
+    (not NaN) and timestamps are plain datetime objects.
+    """
+    if df.empty: return []
+    out = df.astype(object)
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            out[col] = pd.Series(df[col].dt.to_pydatetime(), index=df.index, dtype=object)
+    return out.where(df.notna(), None).to_dict('records')
+
+def list_trades(user_id, ticker=None):
+    """
+    Back-compat: list of dicts (one per trade), newest first.
+    """
+    return trade_records(list_trades_df(user_id, ticker))
 
 def add_trade(trade_data):
     """
     trade_data: dict with user_id, ticker, datetime, action, shares, price, fee, note
+    Single-row case of add_trades_bulk. Returns the trade id (via RETURNING).
     """
-    engine = init_connection()
-    if not engine: raise StorageError("DB Offline")
+    return add_trades_bulk([trade_data])[0]
+
+def add_trades_bulk(trades):
+    """
+    Insert many trades in ONE transaction as multi-row INSERT ... VALUES (...), (...)
+    statements of BULK_PAGE_SIZE rows: one round-trip per page, not per trade.
+    trades: list of dicts, same keys as add_trade. Missing ids are filled in place.
+    Returns the inserted ids (INSERT ... RETURNING id, no follow-up SELECT).
+    """
+    if not trades: return []
     
     try:
+        engine = _get_engine()
         # Validate ID
-        if "id" not in trade_data:
-            trade_data["id"] = str(uuid.uuid4())
-            
-        stmt = text("""
-            INSERT INTO trades (id, user_id, ticker, datetime, action, shares, price, fee, note)
-            VALUES (:id, :user_id, :ticker, :datetime, :action, :shares, :price, :fee, :note)
-        """)
+        for trade_data in trades:
+            if "id" not in trade_data:
+                trade_data["id"] = str(uuid.uuid4())
         
+        rows = [{k: t[k] for k in _TRADE_COLUMNS} for t in trades]
+        ids = []
         with engine.begin() as conn:
-            conn.execute(stmt, trade_data)
+            for i in range(0, len(rows), BULK_PAGE_SIZE):
+                result = conn.execute(_INSERT_TRADES.values(rows[i:i + BULK_PAGE_SIZE]))
+                ids.extend(str(x) for x in result.scalars())
             
-        return True
+        return ids
     except Exception as e:
-        logger.error(f"add_trade Error: {e}")
+        logger.error(f"add_trades_bulk Error: {e}")
         raise e
 
 def delete_trade(trade_id, user_id):
-    engine = init_connection()
-    if not engine: raise StorageError("DB Offline")
-    
     try:
-        stmt = text("DELETE FROM trades WHERE id = :id AND user_id = :user_id")
+        engine = _get_engine()
         with engine.begin() as conn:
-            result = conn.execute(stmt, {"id": trade_id, "user_id": user_id})
+            result = conn.execute(_DELETE_TRADE, {"id": trade_id, "user_id": user_id})
             return result.rowcount > 0
     except Exception as e:
         logger.error(f"delete_trade Error: {e}")
@@ -6,17 +6,17 @@ import io
 
 # Mock streamlit before importing ingest_engine
 class MockStreamlit:
+    def __init__(self):
+        # plain dict acting as secrets (built once, like st.secrets)
+        self.secrets = {"FINAZON_KEY": "dummy_key"}
     def error(self, msg):
         print(f"ST ERROR: {msg}")
     def warning(self, msg):
         print(f"ST WARNING: {msg}")
-    def cache_data(self, ttl=None):
+    def cache_data(self, ttl=None, **kwargs):
         def decorator(func):
             return func
         return decorator
-    @property
-    def secrets(self):
-        return {"FINAZON_API_KEY": "dummy_key"}
 
 sys.modules["streamlit"] = MockStreamlit()
 import ingest_engine
@@ -1,10 +1,39 @@
 import re
+import os
+import json
+import time
+import hashlib
+import functools
 import requests
 from bs4 import BeautifulSoup
 from youtube_transcript_api import YouTubeTranscriptApi
-from PyPDF2 import PdfReader
 import io
 
+# pypdf is the maintained (faster) PyPDF2 fork
+try:
+    from pypdf import PdfReader
+except ImportError:
+    from PyPDF2 import PdfReader
+
+# C-based lxml parser when available (much faster on large pages)
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# Shared session: TCP/TLS connections are reused across URLs
+_SESSION = requests.Session()
+_SESSION.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+
+_YT_RE = re.compile(r'(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})')
+
+# Published transcripts don't change: cache them on disk
+TRANSCRIPT_CACHE_DIR = os.path.join(".cache", "transcripts")
+TRANSCRIPT_TTL = 7 * 86400 # 7 days
+
+MAX_PDF_PAGES = 50 # Don't spend minutes on enormous PDFs
+
 def detect_input_type(content):
     """
     Detects if the input is a YouTube URL, a general URL, or raw text.
@@ -21,49 +50,71 @@ def detect_input_type(content):
         
     return "TEXT"
 
+def _transcript_cache_path(video_id):
+    return os.path.join(TRANSCRIPT_CACHE_DIR, hashlib.md5(video_id.encode()).hexdigest() + ".json")
+
+def _read_cached_transcript(video_id):
+    path = _transcript_cache_path(video_id)
+    try:
+        if time.time() - os.path.getmtime(path) >= TRANSCRIPT_TTL:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['text']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _write_cached_transcript(video_id, text):
+    try:
+        os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+        with open(_transcript_cache_path(video_id), 'w', encoding='utf-8') as f:
+            json.dump({"fetched_at": time.time(), "text": text}, f, ensure_ascii=False)
+    except OSError:
+        pass # Cache is best-effort
+
 def extract_transcript(video_url):
     """
     Extracts transcript from a YouTube video.
     """
     try:
-        if "v=" in video_url:
-            video_id = video_url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in video_url:
-            video_id = video_url.split("youtu.be/")[1].split("?")[0]
-        else:
+        match = _YT_RE.search(video_url)
+        if not match:
             return "Error: Could not extract Video ID."
+        video_id = match.group(1)
+
+        cached = _read_cached_transcript(video_id)
+        if cached is not None:
+            return cached
 
         transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
         transcript_text = " ".join([t['text'] for t in transcript_list])
+        _write_cached_transcript(video_id, transcript_text)
         return transcript_text
     except Exception as e:
         return f"Error fecthing YouTube transcript: {e}"
 
+@functools.lru_cache(maxsize=256)
+def _fetch_url_text(url):
+    """
+    Fetches and cleans page text. Raises on failure so errors are never cached.
+    """
+    response = _SESSION.get(url, timeout=10)
+    response.raise_for_status()
+    
+    soup = BeautifulSoup(response.content, _HTML_PARSER)
+    
+    # Kill all script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+        
+    # One stripped line per text node, blanks dropped
+    return soup.get_text(separator='\n', strip=True)[:10000] # Limit content length
+
 def extract_url_text(url):
     """
     Extracts main text from a generic URL using BeautifulSoup.
     """
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Kill all script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-            
-        text = soup.get_text()
-        
-        # Break into lines and remove leading/trailing space on each
-        lines = (line.strip() for line in text.splitlines())
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        # Drop blank lines
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        return text[:10000] # Limit content length
+        return _fetch_url_text(url)
     except Exception as e:
         return f"Error extracting URL text: {e}"
 
@@ -73,10 +124,7 @@ def extract_text_from_pdf(uploaded_file):
     """
     try:
         reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "\n".join(page.extract_text() or "" for page in reader.pages[:MAX_PDF_PAGES])
     except Exception as e:
         return f"Error extracting PDF text: {e}"
 
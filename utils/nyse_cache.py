@@ -0,0 +1,110 @@
+"""
+nyse_cache.py — Incremental NYSE trading-calendar cache
+
+Keeps ONE schedule covering [today - 2y, today + 100d] on disk
+(.cache/schedule_cache.npz) and serves every request by slicing it in memory.
+Stored as plain int64 epoch-nanosecond arrays (no pickle): the file doesn't
+depend on pandas' internal classes or on the datetime unit it picks.
+The expensive HolidayCalendar expansion only runs when:
+  - no cache exists / it is unreadable
+  - the requested range falls outside the cached window
+  - the cached tail is less than 30 days ahead of today
+"""
+
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("NyseCache")
+
+CACHE_DIR         = ".cache"
+CACHE_FILE        = os.path.join(CACHE_DIR, "schedule_cache.npz")
+LOOKBACK_DAYS     = 730
+LOOKAHEAD_DAYS    = 100
+REFRESH_TAIL_DAYS = 30
+
+_cache = None  # {'start': Timestamp, 'end': Timestamp, 'schedule': DataFrame}
+_lock = threading.Lock()  # one rebuild/write at a time; concurrent callers reuse it
+
+
+def _today():
+    return pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+
+
+def _covers(entry, start, end, today):
+    if not entry:
+        return False
+    if (entry['end'] - today).days < REFRESH_TAIL_DAYS:
+        return False
+    return entry['start'] <= start and end <= entry['end']
+
+
+def _load():
+    """Any unreadable / stale-format file is a cache miss (rebuilt and overwritten)."""
+    try:
+        with np.load(CACHE_FILE, allow_pickle=False) as z:
+            schedule = pd.DataFrame({
+                'market_open':  pd.to_datetime(z['market_open'], unit='ns', utc=True),
+                'market_close': pd.to_datetime(z['market_close'], unit='ns', utc=True),
+            }, index=pd.DatetimeIndex(pd.to_datetime(z['sessions'], unit='ns')))
+            return {'start': pd.Timestamp(int(z['window'][0])),
+                    'end':   pd.Timestamp(int(z['window'][1])),
+                    'schedule': schedule}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Schedule cache unreadable, rebuilding: {e}")
+        return None
+
+
+def _ns(values):
+    # epoch ns (UTC for tz-aware columns). asi8 alone is in the index's own
+    # unit (us/s on pandas >= 2), so normalise to ns explicitly.
+    return pd.DatetimeIndex(values).values.astype('datetime64[ns]').view('i8')
+
+
+def _save(entry):
+    sched = entry['schedule']
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = CACHE_FILE + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f,
+                     window=np.array([entry['start'].value, entry['end'].value], dtype=np.int64),
+                     sessions=_ns(sched.index),
+                     market_open=_ns(sched['market_open']),
+                     market_close=_ns(sched['market_close']))
+        os.replace(tmp, CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"Schedule cache write failed: {e}")
+
+
+def _rebuild(start, end, today):
+    import pandas_market_calendars as mcal
+    win_start = min(today - pd.Timedelta(days=LOOKBACK_DAYS), start)
+    win_end   = max(today + pd.Timedelta(days=LOOKAHEAD_DAYS), end)
+    schedule  = mcal.get_calendar('NYSE').schedule(start_date=win_start, end_date=win_end)
+    return {'start': win_start, 'end': win_end, 'schedule': schedule}
+
+
+def get_schedule(start, end) -> pd.DataFrame:
+    """
+    NYSE schedule (market_open / market_close per session) for [start, end].
+    Accepts anything pd.Timestamp understands; times are dropped.
+    """
+    global _cache
+    start = pd.Timestamp(start).normalize()
+    end   = pd.Timestamp(end).normalize()
+    today = _today()
+
+    with _lock:
+        if not _covers(_cache, start, end, today):
+            _cache = _load()
+        if not _covers(_cache, start, end, today):
+            _cache = _rebuild(start, end, today)
+            _save(_cache)
+        entry = _cache
+
+    return entry['schedule'].loc[start:end]
@@ -1,27 +1,42 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 import pandas as pd
 import sys
 import os
 import io
+import functools
+import orjson
+import tempfile
+import types
+import time
 
 # --- Mock Streamlit Setup ---
 # We must mock streamlit before importing app modules that use it
 class MockStreamlit:
+    def __init__(self):
+        # plain dict acting as secrets (built once, like st.secrets)
+        self.secrets = {"FINAZON_KEY": "dummy_key_for_testing"}
     def error(self, msg):
         print(f"❌ STREAMLIT ERROR: {msg}")
     def warning(self, msg):
         print(f"⚠️ STREAMLIT WARNING: {msg}")
     def info(self, msg):
         print(f"ℹ️ STREAMLIT INFO: {msg}")
-    def cache_data(self, ttl=None):
+    def cache_data(self, ttl=None, **kwargs):
+        # Memoize like the real decorator so repeat calls skip recomputation;
+        # unhashable args (DataFrames, dicts) just call through uncached.
         def decorator(func):
-            return func
+            cached = functools.lru_cache(maxsize=kwargs.get("max_entries") or 128)(func)
+            @functools.wraps(func)
+            def wrapper(*args, **kw):
+                try:
+                    return cached(*args, **kw)
+                except TypeError as e:
+                    if "unhashable" not in str(e): raise
+                    return func(*args, **kw)
+            wrapper.clear = cached.cache_clear
+            return wrapper
         return decorator
-    @property
-    def secrets(self):
-        # returns a dummy dict acting as secrets
-        return {"FINAZON_API_KEY": "dummy_key_for_testing"}
 
 sys.modules["streamlit"] = MockStreamlit()
 
@@ -33,15 +48,37 @@ except ImportError as e:
     print(f"❌ BROKEN: Could not import ingest_engine: {e}")
     sys.exit(1)
 
+# --- CSV Fixtures (UTF-8 bytes, built once; read through BytesIO) ---
+CSV_CN = """代碼 (Ticker),買入股數 (Shares),平均成本,賣出股數(Shares),成交總金額 (Total Cost)
+AAPL,10,150,0,1500
+TSLA,5,200,0,1000
+""".encode("utf-8")
+
+CSV_EN = b"""Ticker,Shares,Price
+NVDA,10,400
+MSFT,20,300
+"""
+
+# --- Finazon Fixture (one payload + a plain response stub; no per-test MagicMock) ---
+FINAZON_FIXTURE = {
+    "data": [
+        {"t": 1672531200, "o": 100, "h": 110, "l": 90, "c": 105, "v": 10000},
+        {"t": 1672617600, "o": 105, "h": 115, "l": 100, "c": 110, "v": 12000}
+    ]
+}
+
+class _FakeResp:
+    status_code = 200
+    content = orjson.dumps(FINAZON_FIXTURE)
+    text = content.decode()
+    def json(self):
+        return FINAZON_FIXTURE
+
 class TestBackendLogic(unittest.TestCase):
     
     def test_01_load_portfolio_chinese(self):
         print("\n[Test 1] Verifying Chinese CSV Format Loading...")
-        csv_content = """代碼 (Ticker),買入股數 (Shares),平均成本,賣出股數(Shares),成交總金額 (Total Cost)
-AAPL,10,150,0,1500
-TSLA,5,200,0,1000
-"""
-        file_buffer = io.StringIO(csv_content)
+        file_buffer = io.BytesIO(CSV_CN)
         df = ingest_engine.load_portfolio(file_buffer)
         
         if df.empty:
@@ -53,11 +90,7 @@ TSLA,5,200,0,1000
 
     def test_02_load_portfolio_english(self):
         print("\n[Test 2] Verifying English CSV Format Loading...")
-        csv_content = """Ticker,Shares,Price
-NVDA,10,400
-MSFT,20,300
-"""
-        file_buffer = io.StringIO(csv_content)
+        file_buffer = io.BytesIO(CSV_EN)
         df = ingest_engine.load_portfolio(file_buffer)
         
         if df.empty:
@@ -70,20 +103,13 @@ MSFT,20,300
     def test_03_finazon_api_structure(self):
         print("\n[Test 3] Verifying Finazon API Data Handling (Mocked)...")
         with patch('ingest_engine.requests.get') as mock_get:
-            mock_response = MagicMock()
             # Mocking a valid Finazon response structure
-            mock_response.json.return_value = {
-                "data": [
-                    {"t": 1672531200, "o": 100, "h": 110, "l": 90, "c": 105, "v": 10000},
-                    {"t": 1672617600, "o": 105, "h": 115, "l": 100, "c": 110, "v": 12000}
-                ]
-            }
-            mock_response.status_code = 200
-            mock_get.return_value = mock_response
+            mock_get.return_value = _FakeResp()
             
             df = ingest_engine.get_price_data_finazon("AAPL")
             self.assertFalse(df.empty)
-            self.assertIn("Close", df.columns)
+            cols = set(df.columns)
+            self.assertLessEqual({"Close"}, cols)
             print("✅ Finazon data structure handled correctly")
 
     def test_04_market_data_engine(self):
@@ -91,26 +117,104 @@ MSFT,20,300
         from ingest_engine import MarketDataEngine
         engine = MarketDataEngine()
         
-        with patch('ingest_engine.requests.get') as mock_get:
-            mock_response = MagicMock()
-            mock_response.status_code = 200
-            # V11.3 expects lowercase keys from 't', 'o', etc.
-            mock_response.json.return_value = {
-                "data": [
-                    {"t": 1672531200, "o": 100, "h": 110, "l": 90, "c": 105, "v": 10000},
-                    {"t": 1672617600, "o": 105, "h": 115, "l": 100, "c": 110, "v": 12000}
-                ]
-            }
-            mock_get.return_value = mock_response
+        # Engine fetches through its keep-alive requests.Session
+        with patch('ingest_engine.requests.Session.get') as mock_get:
+            # V11.3 expects lowercase keys from 't', 'o', etc. (raw bytes: engine decodes with orjson)
+            mock_get.return_value = _FakeResp()
             
             df = engine.get_price_data("AAPL")
             
             self.assertFalse(df.empty)
-            self.assertIn("timestamp", df.columns)
-            self.assertIn("close", df.columns)
-            self.assertIn("MA20", df.columns)
-            self.assertIn("RSI", df.columns)
+            cols = set(df.columns)
+            self.assertLessEqual({"timestamp", "close", "MA20", "RSI"}, cols)
             print("✅ MarketDataEngine columns & indicators verified")
 
+class TestBulkFetch(unittest.TestCase):
+    def test_bulk_returns_frames_and_spaces_requests(self):
+        print("\n[Test 7] Verifying get_price_data_bulk shape + shared request throttle...")
+        from ingest_engine import MarketDataEngine
+        tickers = ["AAPL", "MSFT", "NVDA"]
+        spacing = 0.2
+        starts = []
+
+        def fake_get(*args, **kwargs):
+            starts.append(time.monotonic())
+            return _FakeResp()
+
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.object(ingest_engine, "REQUEST_SPACING", spacing), \
+             patch.object(ingest_engine, "PARQUET_DIR", os.path.join(tmp, "data")), \
+             patch('ingest_engine.requests.Session.get', side_effect=fake_get):
+            engine = MarketDataEngine()
+            engine.db_path = os.path.join(tmp, "market_data.db")
+            engine._init_db()
+            result = engine.get_price_data_bulk(tickers)
+
+        self.assertEqual(list(result), tickers)
+        for t in tickers:
+            self.assertFalse(result[t].empty)
+            self.assertEqual(set(result[t]["ticker"]), {t})
+        self.assertEqual(len(starts), len(tickers))
+        gaps = [b - a for a, b in zip(sorted(starts), sorted(starts)[1:])]
+        self.assertTrue(all(g >= spacing - 0.01 for g in gaps), gaps)
+        print("✅ Bulk fetch shape & request spacing verified")
+
+class TestNyseCache(unittest.TestCase):
+    def test_schedule_disk_round_trip(self):
+        print("\n[Test 5] Verifying NYSE schedule cache survives a reload from disk...")
+        from utils import nyse_cache
+
+        def schedule(start_date, end_date):
+            # tz-aware, non-ns columns: the shape that broke the ns round-trip
+            days = pd.bdate_range(start_date, end_date)
+            opens = (days + pd.Timedelta(hours=14, minutes=30)).tz_localize("UTC").as_unit("us")
+            return pd.DataFrame({"market_open": opens, "market_close": opens + pd.Timedelta(hours=6, minutes=30)},
+                                index=days.as_unit("us"))
+
+        fake_mcal = types.SimpleNamespace(get_calendar=lambda name: types.SimpleNamespace(schedule=schedule))
+        end = nyse_cache._today()
+        start = end - pd.Timedelta(days=365)
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.object(nyse_cache, "CACHE_DIR", tmp), \
+             patch.object(nyse_cache, "CACHE_FILE", os.path.join(tmp, "schedule_cache.npz")), \
+             patch.object(nyse_cache, "_cache", None), \
+             patch.dict(sys.modules, {"pandas_market_calendars": fake_mcal}):
+            first = nyse_cache.get_schedule(start, end)
+            nyse_cache._cache = None  # force the next call to read the file
+            second = nyse_cache.get_schedule(start, end)
+
+        self.assertGreater(len(first), 0)
+        self.assertEqual(len(first), len(second))
+        self.assertTrue((first.index == second.index).all())
+        self.assertTrue((first["market_open"] == second["market_open"]).all())
+        print("✅ Schedule cache round-trip verified")
+
+class TestRalphG6(unittest.TestCase):
+    def _frame(self):
+        idx = pd.date_range("2024-01-02", periods=5, freq="B")
+        df = pd.DataFrame({"Open": 100.0, "High": 110.0, "Low": 90.0, "Close": 105.0, "Volume": 1.0}, index=idx)
+        df.loc[idx[1], ["Open", "Low"]] = [float("nan"), 106.0]   # NaN Open, Low > Close
+        df.loc[idx[3], ["Close", "High"]] = [float("nan"), 99.0]  # NaN Close, High < Open
+        df.loc[idx[4], ["Open", "Close"]] = [float("nan"), float("nan")]  # both NaN: skipped
+        return df
+
+    def test_g6_nan_open_close_rows_fail(self):
+        print("\n[Test 6] Verifying G6 flags NaN Open/Close rows (NumPy + numba paths)...")
+        import ralph_loop_validator as rlv
+        ctx = rlv.ChartContext(symbol="TEST", interval=rlv.Resolution.DAILY, period="max")
+        for use_numba in sorted({False, rlv._HAS_NUMBA}):
+            with self.subTest(numba=use_numba), patch.object(rlv, "_HAS_NUMBA", use_numba):
+                with self.assertRaisesRegex(rlv.RalphGateFailure, r"\[G6\].*Found 2 rows"):
+                    rlv.validate_dataframe(self._frame(), ctx, 5, [])
+        print("✅ G6 NaN-side semantics verified")
+
 if __name__ == '__main__':
-    unittest.main()
+    # Tests are independent: fan out over cores with pytest-xdist when available
+    # (equivalent: `pytest -n auto verify_backend.py`), else plain unittest.
+    try:
+        import pytest
+        import xdist  # noqa: F401
+    except ImportError:
+        unittest.main()
+    else:
+        sys.exit(pytest.main([__file__, "-n", "auto", "-q"]))
@@ -30,8 +30,8 @@ def main():
             "fee": 5.0,
             "note": "Verify Script Test"
         }
-        storage.add_trade(trade)
-        print("✅ Trade Added.")
+        trade_id = storage.add_trade(trade)
+        print(f"✅ Trade Added. (id={trade_id})")
     except Exception as e:
         print(f"❌ Failed to Add Trade: {e}")
         sys.exit(1)
@@ -49,7 +49,7 @@ def main():
     # 4. Cleanup
     print("🗑️ Cleaning up...")
     try:
-        storage.delete_trade(trades[0]['id'], user_id)
+        storage.delete_trade(trade_id, user_id)
         print("✅ Cleanup complete.")
     except Exception as e:
         print(f"⚠️ Cleanup failed: {e}")